@@ -0,0 +1 @@
+# Anchors pytest's rootdir here so tests can import lola_agent from the repository root.
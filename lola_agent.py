@@ -5,20 +5,31 @@ Production-ready workflow for collecting employment contract information.
 """
 
 import os
+import sys
 import json
 import uuid
+import asyncio
+import threading
+import contextvars
+import argparse
 import re
+import time
+import bisect
 import calendar
+import functools
+import contextlib
 from typing import Literal, TypedDict, Annotated
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 from dateutil.relativedelta import relativedelta
 from dateutil.parser import parse as dateutil_parse
 
 from langchain_anthropic import ChatAnthropic
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, AnyMessage
+from langchain_core.caches import InMemoryCache
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, AnyMessage, message_chunk_to_message
 from langchain_core.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.graph import StateGraph, END, START
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
@@ -33,6 +44,13 @@ load_dotenv()
 ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL")
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+LLM_RESPONSE_CACHE = os.getenv("LLM_RESPONSE_CACHE", "").lower() in {"1", "true", "yes"}
+LLM_RESPONSE_CACHE_SIZE = 128
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Optional SQLite persistence; needs the langgraph-checkpoint-sqlite and aiosqlite pins from mini-agent-requirements.txt
+CHECKPOINT_DB = os.getenv("CHECKPOINT_DB")
+# Persist graph state once when a run exits instead of after every super-step
+CHECKPOINT_DURABILITY = "exit"
 
 EXIT_KEYWORDS = {"exit", "bye", "quit", "stop", "cancel", "goodbye", "end"}
 
@@ -64,6 +82,19 @@ COMMON_REQUIRED = [
     "contract_signing_date", "company_representative", "worker_representative"
 ]
 
+_COMMON_REQUIRED_CHECK = tuple(f for f in COMMON_REQUIRED if f != "contract_version")
+
+_STATE_FIELDS_STR = (
+    "full_name", "gender", "job_title", "start_date",
+    "contract_signing_date", "company_representative", "worker_representative",
+)
+
+_STATE_FIELDS_OPT = (
+    "end_date", "workload_percentage", "annual_gross_salary", "monthly_gross_salary",
+    "hourly_salary", "hourly_workload_per_month", "original_contract_starting_date",
+    "original_contract_signing_date", "weekly_working_hours",
+)
+
 AUTHORIZED_SIGNATORIES = [
     "Matthias Pfister",
     "Louisa Hugenschmidt",
@@ -72,6 +103,8 @@ AUTHORIZED_SIGNATORIES = [
     "Diana Trogrlić",
 ]
 
+_AUTHORIZED_LOWER = tuple(name.lower() for name in AUTHORIZED_SIGNATORIES)
+
 VERSION_NAMES = {
     "A": "New Employee (Standard)",
     "B": "New Employee (Fixed Term)",
@@ -84,10 +117,28 @@ VERSION_NAMES = {
 # TOOLS
 # =============================================================================
 
+# Formats tried with strptime before falling back to dateutil's fuzzy parser.
+_FAST_FORMATS = (
+    "%Y-%m-%d", "%d/%m/%Y", "%m/%d/%Y", "%d-%m-%Y",
+    "%Y/%m/%d", "%d %B %Y", "%B %d %Y", "%d %b %Y",
+)
+
+_RE_DURATION_PROBE = re.compile(r'\d+\s*(day|week|month|year)')
+_RE_DURATION = re.compile(r'(\d+)\s*(day|week|month|year)s?')
+_RE_WORD = re.compile(r'[a-z]+')
+
+
+@functools.lru_cache(maxsize=1)
+def _today_snapshot(epoch_second: int) -> tuple[datetime, str, str, int]:
+    today = datetime.fromtimestamp(epoch_second).replace(hour=0, minute=0, second=0, microsecond=0)
+    current_weekday = today.weekday()
+    return today, today.strftime("%Y-%m-%d"), WEEKDAY_NAMES[current_weekday], current_weekday
+
+
 def get_weekday_from_text(text: str) -> int | None:
-    text = text.lower().strip()
-    for day_name, day_num in WEEKDAY_MAP.items():
-        if day_name in text:
+    for token in _RE_WORD.findall(text.lower()):
+        day_num = WEEKDAY_MAP.get(token)
+        if day_num is not None:
             return day_num
     return None
 
@@ -111,10 +162,7 @@ def parse_relative_date(date_expression: str) -> str:
 
     The tool returns the exact date - USE THIS DATE, do not calculate dates yourself!
     """
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    current_weekday = today.weekday()
-    today_str = today.strftime("%Y-%m-%d")
-    today_day_name = WEEKDAY_NAMES[current_weekday]
+    today, today_str, today_day_name, current_weekday = _today_snapshot(int(time.time()))
 
     expr = date_expression.lower().strip()
     result_date = None
@@ -122,18 +170,18 @@ def parse_relative_date(date_expression: str) -> str:
     if expr in ["today", "now"]:
         result_date = today
     elif expr == "tomorrow":
-        result_date = today + relativedelta(days=1)
+        result_date = today + timedelta(days=1)
     elif expr == "yesterday":
-        result_date = today - relativedelta(days=1)
-    elif re.search(r'\d+\s*(day|week|month|year)', expr):
-        match = re.search(r'(\d+)\s*(day|week|month|year)s?', expr)
+        result_date = today - timedelta(days=1)
+    elif _RE_DURATION_PROBE.search(expr):
+        match = _RE_DURATION.search(expr)
         if match:
             num = int(match.group(1))
             unit = match.group(2)
             if unit == "day":
-                result_date = today + relativedelta(days=num)
+                result_date = today + timedelta(days=num)
             elif unit == "week":
-                result_date = today + relativedelta(weeks=num)
+                result_date = today + timedelta(weeks=num)
             elif unit == "month":
                 result_date = today + relativedelta(months=num)
             elif unit == "year":
@@ -142,7 +190,7 @@ def parse_relative_date(date_expression: str) -> str:
         days_until_monday = (7 - current_weekday) % 7
         if days_until_monday == 0:
             days_until_monday = 7
-        result_date = today + relativedelta(days=days_until_monday)
+        result_date = today + timedelta(days=days_until_monday)
     elif expr == "next month":
         result_date = (today + relativedelta(months=1)).replace(day=1)
     elif expr == "next year":
@@ -156,32 +204,41 @@ def parse_relative_date(date_expression: str) -> str:
         target_weekday = get_weekday_from_text(expr)
         if target_weekday is not None:
             days_diff = target_weekday - current_weekday
-            result_date = today + relativedelta(days=days_diff)
+            result_date = today + timedelta(days=days_diff)
     elif expr.startswith("next "):
         target_weekday = get_weekday_from_text(expr)
         if target_weekday is not None:
             days_diff = target_weekday - current_weekday
             if days_diff <= 0:
                 days_diff += 7
-            result_date = today + relativedelta(days=days_diff)
+            result_date = today + timedelta(days=days_diff)
     elif expr.startswith("last "):
         target_weekday = get_weekday_from_text(expr)
         if target_weekday is not None:
             days_diff = current_weekday - target_weekday
             if days_diff <= 0:
                 days_diff += 7
-            result_date = today - relativedelta(days=days_diff)
+            result_date = today - timedelta(days=days_diff)
     else:
         target_weekday = get_weekday_from_text(expr)
         if target_weekday is not None:
             days_diff = target_weekday - current_weekday
             if days_diff <= 0:
                 days_diff += 7
-            result_date = today + relativedelta(days=days_diff)
+            result_date = today + timedelta(days=days_diff)
+
+    if result_date is None:
+        stripped = date_expression.strip()
+        for fmt in _FAST_FORMATS:
+            try:
+                result_date = datetime.strptime(stripped, fmt)
+                break
+            except ValueError:
+                continue
 
     if result_date is None:
         try:
-            result_date = dateutil_parse(date_expression, fuzzy=True, default=today)
+            result_date = dateutil_parse(date_expression, fuzzy=True, dayfirst=True, default=today)
         except (ValueError, TypeError):
             return f"ERROR: Could not parse '{date_expression}'. Today is {today_day_name}, {today_str}. Try: 'next Monday', 'in 2 weeks', 'tomorrow'."
 
@@ -203,6 +260,11 @@ def parse_relative_date(date_expression: str) -> str:
     return f"RESOLVED DATE: {result_day_name}, {result_str} {days_context}. (Today is {today_day_name}, {today_str})"
 
 
+TOOLS = [parse_relative_date, get_current_datetime]
+
+# Serialized once and shared by every model binding
+_TOOL_SCHEMA = [convert_to_openai_tool(t) for t in TOOLS]
+
 
 # =============================================================================
 # STATE
@@ -258,58 +320,88 @@ def calculate_hourly_salary(monthly_salary: float, hourly_workload: float) -> fl
     return monthly_salary / hourly_workload
 
 
+def _compute_A(updates: dict, data: dict) -> None:
+    annual = data.get("annual_gross_salary", 0)
+    if annual:
+        monthly = round(calculate_monthly_from_annual(annual), 2)
+        updates["monthly_gross_salary"] = monthly
+        # Derive the hourly rate from the rounded figures written to the contract so they reconcile
+        hourly_workload = updates.get("hourly_workload_per_month", data.get("hourly_workload_per_month", 0))
+        if hourly_workload:
+            updates["hourly_salary"] = round(calculate_hourly_salary(monthly, hourly_workload), 2)
+
+
+def _compute_B(updates: dict, data: dict) -> None:
+    monthly = data.get("monthly_gross_salary", 0)
+    if monthly:
+        updates["annual_gross_salary"] = round(calculate_annual_from_monthly(monthly), 2)
+        hourly_workload = updates.get("hourly_workload_per_month", data.get("hourly_workload_per_month", 0))
+        if hourly_workload:
+            updates["hourly_salary"] = round(calculate_hourly_salary(monthly, hourly_workload), 2)
+
+
+def _compute_C(updates: dict, data: dict) -> None:
+    hourly = data.get("hourly_salary", 0)
+    hourly_workload = data.get("hourly_workload_per_month", 0)
+    if hourly and hourly_workload:
+        monthly = hourly * hourly_workload
+        updates["monthly_gross_salary"] = round(monthly, 2)
+        updates["annual_gross_salary"] = round(calculate_annual_from_monthly(monthly), 2)
+
+
+_ANNUAL_VERSIONS = frozenset(("A", "D", "A1"))
+
+_VERSION_COMPUTE = {
+    **{v: _compute_A for v in _ANNUAL_VERSIONS},
+    "B": _compute_B,
+    "C": _compute_C,
+}
+
+
 def calculate_all_values(data: dict) -> dict:
     version = data.get("contract_version", "")
     if not version:
         return data
 
-    result = data.copy()
+    updates = {}
     workload = data.get("workload_percentage")
 
     if version == "C" and not workload:
         hourly_workload = data.get("hourly_workload_per_month", 0)
         if hourly_workload > 0:
             workload = (hourly_workload * 12) / (42 * 52) * 100
-            result["workload_percentage"] = round(workload, 2)
+            updates["workload_percentage"] = round(workload, 2)
 
     if workload:
         weekly_hours = calculate_weekly_working_hours(workload)
-        result["weekly_working_hours"] = round(weekly_hours, 2)
+        updates["weekly_working_hours"] = round(weekly_hours, 2)
 
         if version != "C" or not data.get("hourly_workload_per_month"):
             hourly_workload = calculate_hourly_workload_per_month(weekly_hours)
-            result["hourly_workload_per_month"] = round(hourly_workload, 2)
-
-    if version in ["A", "D", "A1"]:
-        annual = data.get("annual_gross_salary", 0)
-        if annual:
-            monthly = calculate_monthly_from_annual(annual)
-            result["monthly_gross_salary"] = round(monthly, 2)
-            hourly_workload = result.get("hourly_workload_per_month", 0)
-            if hourly_workload:
-                result["hourly_salary"] = round(calculate_hourly_salary(monthly, hourly_workload), 2)
-    elif version == "B":
-        monthly = data.get("monthly_gross_salary", 0)
-        if monthly:
-            result["annual_gross_salary"] = round(calculate_annual_from_monthly(monthly), 2)
-            hourly_workload = result.get("hourly_workload_per_month", 0)
-            if hourly_workload:
-                result["hourly_salary"] = round(calculate_hourly_salary(monthly, hourly_workload), 2)
-    elif version == "C":
-        hourly = data.get("hourly_salary", 0)
-        hourly_workload = data.get("hourly_workload_per_month", 0)
-        if hourly and hourly_workload:
-            monthly = hourly * hourly_workload
-            result["monthly_gross_salary"] = round(monthly, 2)
-            result["annual_gross_salary"] = round(calculate_annual_from_monthly(monthly), 2)
+            updates["hourly_workload_per_month"] = round(hourly_workload, 2)
 
-    return result
+    compute = _VERSION_COMPUTE.get(version)
+    if compute:
+        compute(updates, data)
+
+    if not updates:
+        return data
+    return {**data, **updates}
 
 
 # =============================================================================
 # VALIDATION
 # =============================================================================
 
+def _parse_iso(value) -> date | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return None
+
+
 def validate_contract_data(data: dict) -> list[str]:
     errors = []
     version = data.get("contract_version", "")
@@ -318,9 +410,7 @@ def validate_contract_data(data: dict) -> list[str]:
         errors.append(f"Contract version must be explicitly provided. Got: '{version}'. Must be A, B, C, D, or A1.")
         return errors
 
-    for field in COMMON_REQUIRED:
-        if field == "contract_version":
-            continue
+    for field in _COMMON_REQUIRED_CHECK:
         value = data.get(field)
         if not value or (isinstance(value, str) and not value.strip()):
             errors.append(f"Missing required field: {field}")
@@ -338,12 +428,14 @@ def validate_contract_data(data: dict) -> list[str]:
     worker_rep = data.get("worker_representative", "")
 
     if company_rep:
-        is_authorized = any(name.lower() in company_rep.lower() for name in AUTHORIZED_SIGNATORIES)
+        rep_low = company_rep.lower()
+        is_authorized = any(name in rep_low for name in _AUTHORIZED_LOWER)
         if not is_authorized:
             errors.append(f"Unauthorized company representative: '{company_rep}'. Must be one of: {', '.join(AUTHORIZED_SIGNATORIES)}")
 
     if worker_rep:
-        is_authorized = any(name.lower() in worker_rep.lower() for name in AUTHORIZED_SIGNATORIES)
+        rep_low = worker_rep.lower()
+        is_authorized = any(name in rep_low for name in _AUTHORIZED_LOWER)
         if not is_authorized:
             errors.append(f"Unauthorized worker representative: '{worker_rep}'. Must be one of: {', '.join(AUTHORIZED_SIGNATORIES)}")
 
@@ -360,18 +452,36 @@ def validate_contract_data(data: dict) -> list[str]:
     start_date = data.get("start_date", "")
     end_date = data.get("end_date")
     signing_date = data.get("contract_signing_date", "")
+    orig_start = data.get("original_contract_starting_date", "")
+
+    # end_date and the original contract dates hold placeholders like "not specified" outside their versions
+    date_fields = [("start_date", start_date), ("contract_signing_date", signing_date)]
+    if version == "B":
+        date_fields.append(("end_date", end_date))
+    if version in ["D", "A1"]:
+        date_fields.append(("original_contract_starting_date", orig_start))
+
+    parsed = dict.fromkeys(("start_date", "end_date", "contract_signing_date", "original_contract_starting_date"))
+    for field, value in date_fields:
+        parsed[field] = _parse_iso(value)
+        if value and parsed[field] is None:
+            errors.append(f"{field} must be a date in YYYY-MM-DD format, got: '{value}'")
 
-    if signing_date and start_date:
-        if signing_date > start_date:
+    start = parsed["start_date"]
+    end = parsed["end_date"]
+    signing = parsed["contract_signing_date"]
+    original_start = parsed["original_contract_starting_date"]
+
+    if signing and start:
+        if signing > start:
             errors.append(f"Contract signing date ({signing_date}) must be on or before start date ({start_date})")
 
-    if version == "B" and end_date and start_date:
-        if end_date <= start_date:
+    if version == "B" and end and start:
+        if end <= start:
             errors.append(f"End date ({end_date}) must be after start date ({start_date})")
 
     if version in ["D", "A1"]:
-        orig_start = data.get("original_contract_starting_date", "")
-        if orig_start and start_date and orig_start > start_date:
+        if original_start and start and original_start > start:
             errors.append(f"Original contract start ({orig_start}) should be before new start ({start_date})")
 
     return errors
@@ -381,15 +491,52 @@ def validate_contract_data(data: dict) -> list[str]:
 # JSON EXTRACTION
 # =============================================================================
 
-def extract_json_from_text(text: str) -> dict | None:
-    json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*"complete"\s*:\s*true[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
+def _iter_json_spans(text: str):
+    # Single pass with a stack of open-brace positions; each balanced span is
+    # yielded as it closes, innermost first, so stray braces in prose never
+    # hide a later object
+    open_braces = []
+    in_string = False
+    escaped = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            if open_braces:
+                in_string = True
+        elif ch == '{':
+            open_braces.append(i)
+        elif ch == '}' and open_braces:
+            yield open_braces.pop(), i
+
 
-    match = re.search(json_pattern, text, re.DOTALL)
-    if match:
+def extract_json_from_text(text: str) -> dict | None:
+    markers = []
+    pos = text.find('"complete"')
+    while pos != -1:
+        markers.append(pos)
+        pos = text.find('"complete"', pos + 1)
+
+    if not markers:
+        return None
+
+    for start, end in _iter_json_spans(text):
+        # Only parse spans that contain a "complete" key
+        k = bisect.bisect_left(markers, start)
+        if k == len(markers) or markers[k] > end:
+            continue
         try:
-            return json.loads(match.group())
-        except json.JSONDecodeError:
-            pass
+            data = json.loads(text[start:end+1])
+        except (json.JSONDecodeError, RecursionError):
+            continue
+        if isinstance(data, dict) and data.get("complete") is True:
+            return data
 
     try:
         start = text.find('{')
@@ -399,7 +546,7 @@ def extract_json_from_text(text: str) -> dict | None:
             data = json.loads(potential_json)
             if data.get("complete"):
                 return data
-    except json.JSONDecodeError:
+    except (json.JSONDecodeError, RecursionError):
         pass
 
     return None
@@ -409,32 +556,123 @@ def extract_json_from_text(text: str) -> dict | None:
 # NODES
 # =============================================================================
 
-def chatbot(state: State, llm_with_tools, contract_prompt: str) -> dict:
-    messages = state.get("messages", [])
+_INPUT_LOCK = asyncio.Lock()
+
+# Set per conversation in batch mode so shared terminal output says who is speaking
+_OUTPUT_PREFIX: contextvars.ContextVar[str] = contextvars.ContextVar("output_prefix", default="")
+
+
+def _prefixed(text: str) -> str:
+    prefix = _OUTPUT_PREFIX.get()
+    if not prefix:
+        return text
+    return "\n".join(prefix + line if line else line for line in text.split("\n"))
+
+
+async def say(text: str) -> None:
+    async with _INPUT_LOCK:
+        print(_prefixed(text))
+
+
+def _resolve(future: asyncio.Future, result=None, error: BaseException | None = None) -> None:
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
 
-    for msg in reversed(messages):
-        if isinstance(msg, HumanMessage):
-            if msg.content.lower().strip() in EXIT_KEYWORDS:
-                print("Conversation ended.")
-                return {"info_complete": True, "human_decision": "cancel"}
+def _read_stdin_line() -> str:
+    # Raw fd reads hold no interpreter-level stdin lock that could block shutdown
+    data = bytearray()
+    while not data.endswith(b"\n"):
+        chunk = os.read(sys.stdin.fileno(), 1)
+        if not chunk:
+            if not data:
+                raise EOFError
             break
+        data += chunk
+    return data.decode(sys.stdin.encoding or "utf-8").rstrip("\r\n")
+
+
+async def ask(prompt: str) -> str:
+    # Concurrent agents share one terminal, so only one of them reads stdin at a time
+    async with _INPUT_LOCK:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # A daemon thread rather than the default executor: asyncio.run joins executor
+        # threads on shutdown, which would make Ctrl-C wait for the blocked read
+        def read() -> None:
+            try:
+                line = _read_stdin_line()
+            except Exception as e:
+                loop.call_soon_threadsafe(_resolve, future, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, future, line)
+
+        print(_prefixed(prompt), end="", flush=True)
+        threading.Thread(target=read, daemon=True).start()
+        return await future
+
+
+async def stream_response(llm_with_tools, llm_messages: list[AnyMessage]) -> AIMessage:
+    if LLM_RESPONSE_CACHE:
+        # astream bypasses the model's response cache, so cached runs fetch the reply whole
+        response = await llm_with_tools.ainvoke(llm_messages)
+        if response.text:
+            await say(f"🤖 Lola: {response.text}")
+        return response
+
+    # Batch conversations buffer their reply and print it whole instead of interleaving tokens
+    live = not _OUTPUT_PREFIX.get()
+    buffer = None
+    printed = False
+
+    async for chunk in llm_with_tools.astream(llm_messages):
+        buffer = chunk if buffer is None else buffer + chunk
+        text = chunk.text
+        if text and live:
+            if not printed:
+                print("🤖 Lola: ", end="", flush=True)
+                printed = True
+            print(text, end="", flush=True)
+
+    if printed:
+        print()
+    elif buffer is not None and buffer.text:
+        await say(f"🤖 Lola: {buffer.text}")
+
+    if buffer is None:
+        return AIMessage(content="")
+    return message_chunk_to_message(buffer)
+
+
+async def chatbot(state: State, llm_with_tools, system_message: SystemMessage) -> dict:
+    messages = state.get("messages", [])
+
+    # Each turn appends at most one HumanMessage at the end; earlier ones were already checked
+    last_msg = messages[-1] if messages else None
+    if isinstance(last_msg, HumanMessage) and last_msg.content.lower().strip() in EXIT_KEYWORDS:
+        await say("Conversation ended.")
+        return {"info_complete": True, "human_decision": "cancel"}
 
-    llm_messages = [SystemMessage(content=contract_prompt)] + messages
+    llm_messages = [system_message, *messages]
 
     if not messages:
         llm_messages.append(HumanMessage(content="Hi, I need to create an employment contract."))
 
     try:
-        response = llm_with_tools.invoke(llm_messages)
+        response = await stream_response(llm_with_tools, llm_messages)
     except Exception as e:
-        print(f"Error calling LLM: {e}")
+        await say(f"Error calling LLM: {e}")
         return {"info_complete": True, "human_decision": "cancel"}
 
     if response.tool_calls:
         return {"messages": [response]}
 
-    assistant_message = response.content
-    print(f"🤖 Lola: {assistant_message}")
+    assistant_message = response.text
 
     data = extract_json_from_text(assistant_message)
 
@@ -444,39 +682,23 @@ def chatbot(state: State, llm_with_tools, contract_prompt: str) -> dict:
 
         if errors:
             error_msg = "⚠️ Validation errors:\n" + "\n".join(f"  - {e}" for e in errors)
-            print(error_msg)
-            user_input = input("You: ")
+            await say(error_msg)
+            user_input = await ask("You: ")
             return {
                 "messages": [response, AIMessage(content=error_msg), HumanMessage(content=user_input)],
                 "info_complete": False,
             }
 
-        print("✅ Contract data collected and validated")
-        version = data.get("contract_version")
+        await say("✅ Contract data collected and validated")
 
-        return {
-            "messages": [response],
-            "info_complete": True,
-            "contract_version": version,
-            "full_name": data.get("full_name", ""),
-            "gender": data.get("gender", ""),
-            "job_title": data.get("job_title", ""),
-            "start_date": data.get("start_date", ""),
-            "contract_signing_date": data.get("contract_signing_date", ""),
-            "company_representative": data.get("company_representative", ""),
-            "worker_representative": data.get("worker_representative", ""),
-            "end_date": data.get("end_date"),
-            "workload_percentage": data.get("workload_percentage"),
-            "annual_gross_salary": data.get("annual_gross_salary"),
-            "monthly_gross_salary": data.get("monthly_gross_salary"),
-            "hourly_salary": data.get("hourly_salary"),
-            "hourly_workload_per_month": data.get("hourly_workload_per_month"),
-            "original_contract_starting_date": data.get("original_contract_starting_date"),
-            "original_contract_signing_date": data.get("original_contract_signing_date"),
-            "weekly_working_hours": data.get("weekly_working_hours"),
-        }
+        out = {k: data.get(k, "") for k in _STATE_FIELDS_STR}
+        out.update({k: data.get(k) for k in _STATE_FIELDS_OPT})
+        out["messages"] = [response]
+        out["info_complete"] = True
+        out["contract_version"] = data.get("contract_version")
+        return out
 
-    user_input = input("You: ")
+    user_input = await ask("You: ")
 
     return {
         "messages": [response, HumanMessage(content=user_input)],
@@ -484,49 +706,58 @@ def chatbot(state: State, llm_with_tools, contract_prompt: str) -> dict:
     }
 
 
-def human_verification(state: State) -> dict:
+async def human_verification(state: State) -> dict:
     version = state.get("contract_version")
 
-    print("\n" + "=" * 60)
-    print("📋 CONTRACT DATA REVIEW")
-    print("=" * 60)
-    print(f"\n📄 CONTRACT TYPE: Version {version} - {VERSION_NAMES.get(version, 'Unknown')}")
-    print(f"\n👤 EMPLOYEE:")
-    print(f"   Name: {state.get('full_name')}")
-    print(f"   Gender: {state.get('gender')}")
-    print(f"   Title: {state.get('job_title')}")
-    print(f"\n📅 DATES:")
-    print(f"   Start: {state.get('start_date')}")
+    lines = [
+        "\n" + "=" * 60,
+        "📋 CONTRACT DATA REVIEW",
+        "=" * 60,
+        f"\n📄 CONTRACT TYPE: Version {version} - {VERSION_NAMES.get(version, 'Unknown')}",
+        "\n👤 EMPLOYEE:",
+        f"   Name: {state.get('full_name')}",
+        f"   Gender: {state.get('gender')}",
+        f"   Title: {state.get('job_title')}",
+        "\n📅 DATES:",
+        f"   Start: {state.get('start_date')}",
+    ]
     if version == "B":
-        print(f"   End: {state.get('end_date')}")
-    print(f"   Signing: {state.get('contract_signing_date')}")
+        lines.append(f"   End: {state.get('end_date')}")
+    lines.append(f"   Signing: {state.get('contract_signing_date')}")
 
     if version in ["D", "A1"]:
-        print(f"\n📜 ORIGINAL CONTRACT:")
-        print(f"   Start: {state.get('original_contract_starting_date')}")
-        print(f"   Signing: {state.get('original_contract_signing_date')}")
-
-    print(f"\n⏱️ WORKLOAD:")
-    print(f"   {state.get('workload_percentage')}% ({state.get('weekly_working_hours')} hrs/week)")
-
-    print(f"\n💰 SALARY (CHF):")
+        lines += [
+            "\n📜 ORIGINAL CONTRACT:",
+            f"   Start: {state.get('original_contract_starting_date')}",
+            f"   Signing: {state.get('original_contract_signing_date')}",
+        ]
+
+    lines += [
+        "\n⏱️ WORKLOAD:",
+        f"   {state.get('workload_percentage')}% ({state.get('weekly_working_hours')} hrs/week)",
+        "\n💰 SALARY (CHF):",
+    ]
     if state.get('annual_gross_salary'):
-        print(f"   Annual: {state.get('annual_gross_salary'):,.2f}")
+        lines.append(f"   Annual: {state.get('annual_gross_salary'):,.2f}")
     if state.get('monthly_gross_salary'):
-        print(f"   Monthly: {state.get('monthly_gross_salary'):,.2f}")
+        lines.append(f"   Monthly: {state.get('monthly_gross_salary'):,.2f}")
 
-    print(f"\n✍️ SIGNATORIES:")
-    print(f"   Company: {state.get('company_representative')}")
-    print(f"   Worker: {state.get('worker_representative')}")
-    print("\n" + "=" * 60)
+    lines += [
+        "\n✍️ SIGNATORIES:",
+        f"   Company: {state.get('company_representative')}",
+        f"   Worker: {state.get('worker_representative')}",
+        "\n" + "=" * 60,
+    ]
+    # One write instead of one flush per line on a line-buffered terminal
+    await say("\n".join(lines))
 
-    decision = input("\nApprove? (yes/no): ").lower().strip()
+    decision = (await ask("\nApprove? (yes/no): ")).lower().strip()
 
     if decision in ["yes", "y", "approve"]:
-        print("✅ Approved")
+        await say("✅ Approved")
         return {"human_decision": "approve"}
     else:
-        correction = input("What needs correction? ")
+        correction = await ask("What needs correction? ")
         correction_message = HumanMessage(content=f"Correction needed: {correction}")
         return {
             "human_decision": "reject",
@@ -565,25 +796,29 @@ def state_to_json(state: State) -> dict:
     return contract_data
 
 
-def create_entry(state: State) -> dict:
+async def create_entry(state: State) -> dict:
     contract_json = state_to_json(state)
 
-    print(f"\n✅ CONTRACT CREATED")
-    print(f"   Version: {contract_json['contract_version']}")
-    print(f"   Employee: {contract_json['full_name']}")
-    print(f"   Start: {contract_json['start_date']}")
-    print("\n" + json.dumps(contract_json, indent=2, ensure_ascii=False))
+    await say("\n".join([
+        "\n✅ CONTRACT CREATED",
+        f"   Version: {contract_json['contract_version']}",
+        f"   Employee: {contract_json['full_name']}",
+        f"   Start: {contract_json['start_date']}",
+        "\n" + json.dumps(contract_json, indent=2, ensure_ascii=False),
+    ]))
 
     return {"contract_json": contract_json}
 
 
-def update_entry(state: State) -> dict:
+async def update_entry(state: State) -> dict:
     contract_json = state_to_json(state)
 
-    print(f"\n✅ CONTRACT UPDATED")
-    print(f"   Version: {contract_json['contract_version']}")
-    print(f"   Employee: {contract_json['full_name']}")
-    print("\n" + json.dumps(contract_json, indent=2, ensure_ascii=False))
+    await say("\n".join([
+        "\n✅ CONTRACT UPDATED",
+        f"   Version: {contract_json['contract_version']}",
+        f"   Employee: {contract_json['full_name']}",
+        "\n" + json.dumps(contract_json, indent=2, ensure_ascii=False),
+    ]))
 
     return {"contract_json": contract_json}
 
@@ -628,14 +863,18 @@ def route_after_verification(state: State) -> str:
 # =============================================================================
 
 def get_llm(provider: str):
+    # Identical prompts (same messages and bound tools) are answered from memory when enabled
+    cache = InMemoryCache(maxsize=LLM_RESPONSE_CACHE_SIZE) if LLM_RESPONSE_CACHE else None
+
     if provider == "anthropic":
-        return ChatAnthropic(model=ANTHROPIC_MODEL, temperature=0.7, max_tokens=1024)
+        return ChatAnthropic(model=ANTHROPIC_MODEL, temperature=0.7, max_tokens=1024, cache=cache)
     elif provider == "openai":
-        return ChatOpenAI(model=OPENAI_MODEL, temperature=0.7, max_tokens=1024)
+        return ChatOpenAI(model=OPENAI_MODEL, temperature=0.7, max_tokens=1024, cache=cache)
     else:
         raise ValueError(f"Unknown provider: {provider}")
 
 
+@functools.lru_cache(maxsize=8)
 def load_system_prompt(filename: str) -> str:
     try:
         with open(f"prompts/{filename}.md", 'r', encoding='utf-8') as f:
@@ -645,9 +884,16 @@ def load_system_prompt(filename: str) -> str:
         raise
 
 
-def build_workflow(llm_with_tools, tool_node, contract_prompt):
-    def chatbot_wrapper(state: State) -> dict:
-        return chatbot(state, llm_with_tools, contract_prompt)
+def build_system_message(prompt: str, provider: str) -> SystemMessage:
+    if provider == "anthropic":
+        # Mark the static prompt prefix for Anthropic prompt caching
+        return SystemMessage(content=[{"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}}])
+    return SystemMessage(content=prompt)
+
+
+def build_workflow(llm_with_tools, tool_node, system_message: SystemMessage):
+    async def chatbot_wrapper(state: State) -> dict:
+        return await chatbot(state, llm_with_tools, system_message)
 
     workflow = StateGraph(State)
     workflow.add_node("chatbot", chatbot_wrapper)
@@ -692,36 +938,143 @@ def get_initial_state():
     }
 
 
-def main():
-    try:
-        print("=" * 50)
-        print("CONTRACT DATA COLLECTION")
-        print("=" * 50)
+@contextlib.asynccontextmanager
+async def open_checkpointer():
+    if not CHECKPOINT_DB:
+        yield MemorySaver()
+        return
+
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    async with AsyncSqliteSaver.from_conn_string(CHECKPOINT_DB) as checkpointer:
+        yield checkpointer
+
+
+def build_app(checkpointer, provider: str = LLM_PROVIDER):
+    llm = get_llm(provider)
+    llm_with_tools = llm.bind_tools(_TOOL_SCHEMA)
+    tool_node = ToolNode(TOOLS)
+    contract_prompt = load_system_prompt("contract_chatbot_system_prompt")
+
+    # Built once so every turn sends the same prefix, letting the backend reuse its prompt cache
+    system_message = build_system_message(contract_prompt, provider)
+
+    workflow = build_workflow(llm_with_tools, tool_node, system_message)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def new_thread_config(thread_id: str | None = None) -> dict:
+    thread_id = thread_id or f"contract-{uuid.uuid4().hex[:8]}"
+    return {"configurable": {"thread_id": thread_id}, "recursion_limit": 100}
+
+
+def load_batch_states(path: str) -> list[dict]:
+    states = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"⚠️ Skipping {path}:{line_number}: invalid JSON ({e})")
+                continue
+            if not isinstance(entry, dict):
+                print(f"⚠️ Skipping {path}:{line_number}: expected a JSON object, got {type(entry).__name__}")
+                continue
+            state = get_initial_state()
+            if entry.get("message"):
+                state["messages"] = [HumanMessage(content=entry["message"])]
+            states.append(state)
+    return states
+
+
+async def run_conversation(app, thread_id: str | None = None) -> None:
+    config = new_thread_config(thread_id)
+    thread_id = config["configurable"]["thread_id"]
+
+    graph_input = get_initial_state()
+    if CHECKPOINT_DB:
+        snapshot = await app.aget_state(config)
+        if snapshot and snapshot.values:
+            if not snapshot.next:
+                print(f"\nConversation {thread_id} has already finished")
+                return
+            # None continues from the stored checkpoint instead of starting over
+            graph_input = None
+
+    if graph_input is None:
+        print(f"\n🚀 Resuming conversation {thread_id}\n")
+    else:
+        print(f"\n🚀 Starting conversation {thread_id}\n")
+
+    async for event in app.astream(graph_input, config, durability=CHECKPOINT_DURABILITY):
+        pass
+
+    final_state = await app.aget_state(config)
+
+    if final_state and final_state.values:
+        contract_result = final_state.values.get("contract_json")
+        if contract_result:
+            print("\n✅ Workflow complete")
+
 
-        llm = get_llm(LLM_PROVIDER)
-        tools = [parse_relative_date, get_current_datetime]
-        llm_with_tools = llm.bind_tools(tools)
-        tool_node = ToolNode(tools)
-        contract_prompt = load_system_prompt("contract_chatbot_system_prompt")
+async def run_batch(app, states: list[dict], concurrency: int = BATCH_CONCURRENCY) -> list[dict | BaseException]:
+    semaphore = asyncio.Semaphore(concurrency)
 
-        workflow = build_workflow(llm_with_tools, tool_node, contract_prompt)
-        memory = MemorySaver()
-        app = workflow.compile(checkpointer=memory)
+    async def run_one(state: dict) -> dict:
+        config = new_thread_config()
+        _OUTPUT_PREFIX.set(f"[{config['configurable']['thread_id']}] ")
+        async with semaphore:
+            try:
+                return await app.ainvoke(state, config, durability=CHECKPOINT_DURABILITY)
+            except Exception as e:
+                await say(f"❌ Error: {e}")
+                raise
 
-        thread_id = f"contract-{uuid.uuid4().hex[:8]}"
-        config = {"configurable": {"thread_id": thread_id}, "recursion_limit": 100}
+    # A failing conversation is returned as its exception instead of aborting the others
+    return await asyncio.gather(*(run_one(state) for state in states), return_exceptions=True)
 
-        print(f"\n🚀 Starting conversation\n")
 
-        for event in app.stream(get_initial_state(), config):
-            pass
+async def main_async(batch_path: str | None, concurrency: int, thread_id: str | None = None) -> None:
+    async with open_checkpointer() as checkpointer:
+        app = build_app(checkpointer)
 
-        final_state = app.get_state(config)
+        if not batch_path:
+            await run_conversation(app, thread_id)
+            return
+
+        states = load_batch_states(batch_path)
+        print(f"\n🚀 Starting {len(states)} conversations (up to {concurrency} at a time)\n")
+
+        results = await run_batch(app, states, concurrency)
+        failed = sum(1 for result in results if isinstance(result, BaseException))
+        created = sum(1 for result in results if isinstance(result, dict) and result.get("contract_json"))
+        print(f"\n✅ Batch complete: {created}/{len(results)} contracts created, {failed} failed")
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Collect employment contract data.")
+    parser.add_argument("--batch", metavar="CONTRACTS_JSONL",
+                        help='Run one conversation per line; each line is a JSON object with an optional "message" opening the conversation.')
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY,
+                        help="Maximum number of batch conversations running at once.")
+    parser.add_argument("--thread-id",
+                        help="Resume (or start) the conversation with this id; requires CHECKPOINT_DB to persist across runs.")
+    args = parser.parse_args(argv)
+
+    if args.batch and args.thread_id:
+        parser.error("--thread-id cannot be combined with --batch")
+    if args.thread_id and not CHECKPOINT_DB:
+        parser.error("--thread-id requires CHECKPOINT_DB to be set")
+
+    try:
+        print("=" * 50)
+        print("CONTRACT DATA COLLECTION")
+        print("=" * 50)
 
-        if final_state and final_state.values:
-            contract_result = final_state.values.get("contract_json")
-            if contract_result:
-                print("\n✅ Workflow complete")
+        asyncio.run(main_async(args.batch, args.concurrency, args.thread_id))
 
     except KeyboardInterrupt:
         print("\n\nWorkflow interrupted by user")
@@ -0,0 +1,125 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from lola_agent import (
+    calculate_all_values,
+    chatbot,
+    extract_json_from_text,
+    get_weekday_from_text,
+    parse_relative_date,
+    validate_contract_data,
+)
+
+
+def _version_a_contract(**overrides):
+    data = {
+        "contract_version": "A",
+        "full_name": "Anna Muster",
+        "gender": "female",
+        "job_title": "Engineer",
+        "start_date": "2026-03-01",
+        "contract_signing_date": "2026-02-01",
+        "company_representative": "Matthias Pfister",
+        "worker_representative": "Michael Grass",
+        "workload_percentage": 80,
+        "annual_gross_salary": 90000,
+    }
+    data.update(overrides)
+    return data
+
+
+def test_validate_ignores_placeholder_dates_outside_their_version():
+    data = _version_a_contract(end_date="not specified", original_contract_starting_date="N/A")
+    assert validate_contract_data(data) == []
+
+
+def test_validate_rejects_non_iso_start_date():
+    errors = validate_contract_data(_version_a_contract(start_date="1/3/2026"))
+    assert any("start_date must be a date" in e for e in errors)
+
+
+def test_extract_json_recovers_from_unbalanced_brace_in_prose():
+    assert extract_json_from_text('text { unbalanced then {"complete": true}') == {"complete": True}
+
+
+def test_extract_json_finds_nested_completion_object():
+    assert extract_json_from_text('{"result": {"complete": true}}') == {"complete": True}
+
+
+def test_parse_relative_date_reads_slash_dates_day_first_on_both_paths():
+    # The strptime fast path and the fuzzy dateutil fallback must agree
+    assert "2026-04-03" in parse_relative_date.invoke({"date_expression": "03/04/2026"})
+    assert "2026-04-03" in parse_relative_date.invoke({"date_expression": "starting 03/04/2026"})
+
+
+def test_get_weekday_from_text_handles_punctuation_and_possessives():
+    assert get_weekday_from_text("next Monday.") == 0
+    assert get_weekday_from_text("next friday's meeting") == 4
+    assert get_weekday_from_text("'Friday'") == 4
+    assert get_weekday_from_text("next week") is None
+
+
+def test_hourly_salary_reconciles_with_displayed_figures():
+    result = calculate_all_values({"contract_version": "A", "workload_percentage": 33.3, "annual_gross_salary": 1000})
+    assert result["monthly_gross_salary"] == 83.33
+    assert result["hourly_workload_per_month"] == 60.61
+    assert result["hourly_salary"] == round(83.33 / 60.61, 2) == 1.37
+
+
+@pytest.mark.parametrize("data, derived", [
+    ({"contract_version": "A", "workload_percentage": 80, "annual_gross_salary": 90000},
+     {"weekly_working_hours": 33.6, "hourly_workload_per_month": 145.6, "monthly_gross_salary": 7500.0, "hourly_salary": 51.51}),
+    ({"contract_version": "A", "annual_gross_salary": 90000},
+     {"monthly_gross_salary": 7500.0}),
+    ({"contract_version": "A", "annual_gross_salary": 90000, "hourly_workload_per_month": 150},
+     {"monthly_gross_salary": 7500.0, "hourly_salary": 50.0}),
+    ({"contract_version": "B", "workload_percentage": 60, "monthly_gross_salary": 5000},
+     {"weekly_working_hours": 25.2, "hourly_workload_per_month": 109.2, "annual_gross_salary": 60000, "hourly_salary": 45.79}),
+    ({"contract_version": "B", "monthly_gross_salary": 5000},
+     {"annual_gross_salary": 60000}),
+    ({"contract_version": "C", "hourly_workload_per_month": 80, "hourly_salary": 35},
+     {"workload_percentage": 43.96, "weekly_working_hours": 18.46, "monthly_gross_salary": 2800, "annual_gross_salary": 33600}),
+    ({"contract_version": "C", "workload_percentage": 50, "hourly_salary": 35},
+     {"weekly_working_hours": 21.0, "hourly_workload_per_month": 91.0}),
+    ({"contract_version": "C", "workload_percentage": 50, "hourly_workload_per_month": 80, "hourly_salary": 35},
+     {"weekly_working_hours": 21.0, "monthly_gross_salary": 2800, "annual_gross_salary": 33600}),
+    ({"contract_version": "D", "workload_percentage": 100, "annual_gross_salary": 120000},
+     {"weekly_working_hours": 42.0, "hourly_workload_per_month": 182.0, "monthly_gross_salary": 10000.0, "hourly_salary": 54.95}),
+    ({"contract_version": "D", "annual_gross_salary": 120000},
+     {"monthly_gross_salary": 10000.0}),
+    ({"contract_version": "A1", "workload_percentage": 40, "annual_gross_salary": 48000},
+     {"weekly_working_hours": 16.8, "hourly_workload_per_month": 72.8, "monthly_gross_salary": 4000.0, "hourly_salary": 54.95}),
+    ({"contract_version": "A1", "annual_gross_salary": 48000, "hourly_workload_per_month": 72.8},
+     {"monthly_gross_salary": 4000.0, "hourly_salary": 54.95}),
+    ({"contract_version": "", "workload_percentage": 40},
+     {}),
+])
+def test_calculate_all_values(data, derived):
+    original = dict(data)
+    assert calculate_all_values(data) == {**original, **derived}
+    assert data == original
+
+
+class _UnreachableLLM:
+    def astream(self, messages):
+        raise RuntimeError("LLM should not be called")
+
+
+def _run_chatbot(messages):
+    state = {"messages": messages}
+    return asyncio.run(chatbot(state, _UnreachableLLM(), SystemMessage(content="prompt")))
+
+
+def test_chatbot_exits_on_exit_keyword_in_latest_message(capsys):
+    result = _run_chatbot([AIMessage(content="Hi"), HumanMessage(content="  Bye ")])
+    assert result == {"info_complete": True, "human_decision": "cancel"}
+    assert "Conversation ended." in capsys.readouterr().out
+
+
+def test_chatbot_only_checks_latest_message_for_exit_keyword(capsys):
+    _run_chatbot([HumanMessage(content="exit"), AIMessage(content="Are you sure?")])
+    out = capsys.readouterr().out
+    assert "Conversation ended." not in out
+    assert "Error calling LLM" in out